@@ -1,8 +1,10 @@
 import requests
+import requests.adapters
+import concurrent.futures
+import threading
 import typing
 import dataclasses
 import time
-import datetime
 import logging
 
 class Constants:
@@ -34,6 +36,24 @@ class Constants:
         HEADER_CONTENT_JSON = "application/json"
         HEADER_API_KEY = "OSDI-API-Token"
 
+        # Connection pooling and retries
+        POOL_CONNECTIONS = 1
+        # Each upload thread has its own session and only sends one request at a time
+        POOL_MAX_SIZE = 1
+        # Retries are done in _postPersonLimited so every attempt goes through the rate limiter
+        RETRY_TOTAL = 3
+        RETRY_BACKOFF_FACTOR = 0.5
+        RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+        # Rate limiting
+        # Currently (2023-04-15) Action Network rate limits at 4 per second https://actionnetwork.org/docs/#considerations
+        # To avoid any possible conflicts we will only start a request every 0.35 seconds
+        # This applies to background requests too since they count against the same limit
+        SECONDS_PER_REQUEST = 0.35
+        RATE_LIMIT_BURST = 1
+        DEFAULT_UPLOAD_WORKERS = 4
+        FAILURE_BACKOFF_SECONDS = 2
+
         # API Endpoint Keys
         API_PERSON_SIGNUP_HELPER_KEY = "osdi:person_signup_helper"
         API_ENDPOINT = "href"
@@ -44,6 +64,9 @@ class Constants:
         SIGNUP_HELPER_ADD_TAGS = "add_tags"
         SIGNUP_HELPER_REMOVE_TAGS = "remove_tags"
 
+        # Custom fields can't share a name with these person keys
+        RESTRICTED_CUSTOM_FIELDS = frozenset([FIRST_NAME, LAST_NAME, EMAIL_ADDRESSES, PHONE_NUMBERS, POSTAL_ADDRESSES])
+
 @dataclasses.dataclass
 class PersonAddress:
     # Assuming TX becuase chapter is in Austin,TX
@@ -83,10 +106,9 @@ class Person:
             Constants.POSTAL_ADDRESSES : [self.address.toDict()],
             Constants.CUSTOM_FIELDS : {}
         }
-        restrictedCols = set([Constants.FIRST_NAME, Constants.LAST_NAME, Constants.EMAIL_ADDRESSES, Constants.PHONE_NUMBERS, Constants.POSTAL_ADDRESSES])
         for k,v in self.customFields.items():
              outKey = k.lower()
-             if outKey in restrictedCols:
+             if outKey in Constants.RESTRICTED_CUSTOM_FIELDS:
                   raise InvalidPerson("Custom field "+k+" conflicts with restricted API keys")
              if type(v) != str:
                   raise InvalidPerson("Custom field "+k+" of value "+str(v)+" is not of string")
@@ -99,11 +121,90 @@ class InvalidPerson(Exception):
 class InvalidAPIResponse(Exception):
      pass
 
+class RateLimiterClosed(Exception):
+     pass
+
+# Token bucket shared between upload threads
+# Each request takes a token, tokens refill at rate per second up to burst
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.lastRefill = time.monotonic()
+        self.condition = threading.Condition()
+        self.closed = False
+
+    # Wakes everyone waiting in acquire() and makes them raise RateLimiterClosed
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def acquire(self) -> None:
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise RateLimiterClosed("Rate limiter was closed while waiting")
+                now = time.monotonic()
+                # lastRefill is in the future while paused, no tokens are added until then
+                if now > self.lastRefill:
+                    self.tokens = min(self.burst, self.tokens + (now - self.lastRefill) * self.rate)
+                    self.lastRefill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                self.condition.wait(max(0, self.lastRefill - now) + max(0, 1 - self.tokens) / self.rate)
+
+    # Stops everyone from acquiring for seconds, used to back off of the server after a failure
+    # Pauses don't stack, a shorter pause doesn't cut a longer one short
+    def pause(self, seconds: float) -> None:
+        with self.condition:
+            self.tokens = 0
+            self.lastRefill = max(self.lastRefill, time.monotonic() + seconds)
+
 class ActionNetworkAPI:
 
     def __init__(self, apiKey) -> None:
         self.apiKey = apiKey
+        # Sessions aren't guaranteed to be thread safe so each upload thread gets its own
+        self._threadLocal = threading.local()
+        self._sessions = []
+        self._sessionsLock = threading.Lock()
         self._initializeEndpoints()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._sessionsLock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        self._threadLocal = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._threadLocal, "session", None)
+        if session is None:
+            session = ActionNetworkAPI._createSession(self.apiKey)
+            self._threadLocal.session = session
+            with self._sessionsLock:
+                self._sessions.append(session)
+        return session
+
+    # All requests from a thread go through one session so the TLS connection to Action Network is kept alive between people
+    # The session does not retry, retries are done in _postPersonLimited so they are rate limited
+    @staticmethod
+    def _createSession(apiKey: str) -> requests.Session:
+        session = requests.Session()
+        session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=Constants.POOL_CONNECTIONS,
+                                                                pool_maxsize=Constants.POOL_MAX_SIZE))
+        session.headers.update({Constants.HEADER_API_KEY : apiKey})
+        return session
     
     @staticmethod
     def _extractEndpoint(endpointDict: dict, api: str) -> str:
@@ -116,7 +217,7 @@ class ActionNetworkAPI:
          
     def _initializeEndpoints(self) -> None:
          # Get available APIs
-         response = requests.get(Constants.API_ENTRY, headers=self._headersForRequest())
+         response = self.session.get(Constants.API_ENTRY)
          response.raise_for_status()
          # Action Network API shoul return a JSON response for endpoints 
          # https://actionnetwork.org/docs/v2/post-people/
@@ -128,56 +229,82 @@ class ActionNetworkAPI:
          # Extract APIs we want
          self.personSignupHelper = ActionNetworkAPI._extractEndpoint(endpoints, Constants.API_PERSON_SIGNUP_HELPER_KEY)
 
-    
-    def _headersForRequest(self) -> dict:
-         # Requests should add in json content header https://requests.readthedocs.io/en/latest/user/quickstart/?highlight=raise_for_status#more-complicated-post-requests
-         return {
-              Constants.HEADER_API_KEY : self.apiKey
-         } 
-
-    # Send a list of people to Action Network synchronously and sequentially
-    # If any of the post request fails no later request will be attempted and an exception will be raised
-    # CURRENTLY DO NOT RETRY PROGRAMATICALLY UPON EXCEPTION
-    # Action Network asks for exopential backoff on failures and this function does not account for that
-    # Returns a list of people that failed
-    def postPeople(self, people: list[type[Person]], useBackgroundProcessing:bool = True) -> list[tuple[str,str]]:
-         # Currently (2023-04-15) Action Network rate limits at 4 per second https://actionnetwork.org/docs/#considerations
-         # To avoid any possible conflicts we will wait 0.35 seconds per request
-         # Upon failure a exception will be raised and assumed to kill the program
-         failedUploads = []
+
+    # Send a list of people to Action Network using up to maxWorkers concurrent requests
+    # All threads share one rate limiter so every attempt, including retries, stays under Action Network's rate limit regardless of maxWorkers
+    # Background requests are rate limited the same as non-background requests
+    # A failed upload does not stop later uploads, failures are logged and returned
+    # 429, 5xx and connection errors are retried with exponential backoff (see _postPersonLimited)
+    # Any failure pauses the shared rate limiter so all threads back off of the server, not just the one that failed
+    # Sessions made by the upload threads are closed before returning
+    # If interrupted (e.g. Ctrl-C) people that haven't started uploading are cancelled and the exception is re-raised
+    # Returns a list of people that failed in the same order as people
+    def postPeople(self, people: list[type[Person]], useBackgroundProcessing:bool = True, maxWorkers: int = Constants.DEFAULT_UPLOAD_WORKERS) -> list[tuple[str,str]]:
+         limiter = RateLimiter(rate=1/Constants.SECONDS_PER_REQUEST, burst=Constants.RATE_LIMIT_BURST)
          numPeople = len(people)
-         currentPerson = 0
-         for person in people:
-              logging.info("Uploading "+person.firstName+" "+person.lastName+" "+str(currentPerson)+"/"+str(numPeople))
-              startTime = datetime.datetime.now()
+         with self._sessionsLock:
+              existingSessions = list(self._sessions)
+         executor = concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers)
+         try:
+              futures = [executor.submit(self._postPersonLimited, person, useBackgroundProcessing, limiter, index, numPeople)
+                         for index, person in enumerate(people)]
+              results = [future.result() for future in futures]
+         finally:
+              # Cancel anyone not yet started and stop anyone waiting on the limiter so Ctrl-C stops the upload after the in flight requests finish
+              limiter.close()
+              executor.shutdown(wait=True, cancel_futures=True)
+              self._closeSessionsExcept(existingSessions)
+         return [result for result in results if result is not None]
+
+    # Closes and forgets every session not in keep
+    # The worker threads are gone once postPeople returns so their sessions would never be used again
+    def _closeSessionsExcept(self, keep: list[requests.Session]) -> None:
+         with self._sessionsLock:
+              toClose = [session for session in self._sessions if not any(session is k for k in keep)]
+              self._sessions = [session for session in self._sessions if any(session is k for k in keep)]
+         for session in toClose:
+              session.close()
+
+    # The signup helper matches on email so retrying a POST will not create duplicate people
+    @staticmethod
+    def _isRetryable(err: Exception) -> bool:
+         if isinstance(err, requests.HTTPError):
+              return err.response is not None and err.response.status_code in Constants.RETRY_STATUS_CODES
+         return isinstance(err, (requests.ConnectionError, requests.Timeout))
+
+    # Takes a token from the limiter before every attempt, including retries
+    # Returns None on success otherwise a tuple of (personText, errorText)
+    def _postPersonLimited(self, person: type[Person], useBackgroundProcessing: bool, limiter: RateLimiter, index: int, numPeople: int) -> typing.Optional[tuple[str,str]]:
+         logging.info("Uploading %s %s %d/%d", person.firstName, person.lastName, index, numPeople)
+         for attempt in range(Constants.RETRY_TOTAL + 1):
+              limiter.acquire()
               try:
                    self._postPerson(person, useBackgroundProcessing)
+                   return None
               except Exception as err:
+                   if attempt < Constants.RETRY_TOTAL and ActionNetworkAPI._isRetryable(err):
+                        backoff = Constants.RETRY_BACKOFF_FACTOR * (2 ** attempt)
+                        logging.warning("Retrying %s %s in %.1f seconds because of %s", person.firstName, person.lastName, backoff, err)
+                        limiter.pause(backoff)
+                        continue
                    personText = f"({person.firstName}, {person.lastName}, {person.email})"
                    errorText = f"{err}"
                    logging.error("Failed to upload: %s because of %s", personText, errorText)
-                   failedUploads.append((personText, errorText))
-                   # Sleep an extra few seconds to back off of server
-                   time.sleep(2)
-
-              # Sleep to avoid rate limit if we aren't background processing
-              timeInRequest = datetime.datetime.now() - startTime
-              if not useBackgroundProcessing and timeInRequest < datetime.timedelta(seconds=0.35):
-                   timeToSleep = 0.5 - timeInRequest.seconds
-                   if timeToSleep > 0:
-                        time.sleep(timeToSleep)
-              currentPerson += 1
-         return failedUploads
+                   # Back off of server for a few seconds, this holds up every thread
+                   limiter.pause(Constants.FAILURE_BACKOFF_SECONDS)
+                   return (personText, errorText)
     
     # Do not use this directly
     # The API is rate limited so using this in a tight for loop could cause issues
+    # Safe to call from multiple threads since self.session is per thread
     # To post a single person use postPeople() with a list of a single person
     def _postPerson(self, person: type[Person], useBackgroundProcessing: bool  = True) -> None:
         # Currently we do not support adding or removing tags
         params = {}
         if useBackgroundProcessing:
           params[Constants.BACKGROUN_PROCESSING_QUERY_PARAM] = True
-        req = requests.post(self.personSignupHelper, json=person.toSignupHelperDict(), headers=self._headersForRequest(), params=params)
+        # Requests adds in the json content header https://requests.readthedocs.io/en/latest/user/quickstart/?highlight=raise_for_status#more-complicated-post-requests
+        req = self.session.post(self.personSignupHelper, json=person.toSignupHelperDict(), params=params)
         # We currently don't care about the response as long as it is not failure
         req.raise_for_status()
 
@@ -109,8 +109,9 @@ class CommmandFlags:
     DO_NOT_ACTION_NETWORK = "--nan"
     USE_LOCAL_RETENTION = "--local_retention"
     BACKGROUND = "--background"
+    AN_WORKERS = "--an_workers"
 
-    def __init__(self, filename : str, doNotArchive : bool, doNotRetention : bool, doNotActionNetwork : bool, automateActionNetwork : bool, automateGoogleDrive: bool, useLocalRetention : bool, useANBackground: bool) -> None:
+    def __init__(self, filename : str, doNotArchive : bool, doNotRetention : bool, doNotActionNetwork : bool, automateActionNetwork : bool, automateGoogleDrive: bool, useLocalRetention : bool, useANBackground: bool, anWorkers: int) -> None:
         self.filename = filename
         self.archive = not doNotArchive
         self.retention = not doNotRetention
@@ -119,6 +120,13 @@ class CommmandFlags:
         self.automateGoogleDrive = automateGoogleDrive
         self.useLocalRetention = useLocalRetention
         self.useANBackground = useANBackground
+        self.anWorkers = anWorkers
+
+def positiveInt(value: str) -> int:
+    intValue = int(value)
+    if intValue < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return intValue
 
 def parseArgs():
     # I am using hardcoded strings here since you can't subscript the parsed args by the argument name
@@ -167,7 +175,13 @@ def parseArgs():
                         dest="background",
                         default=False,
                         action="store_true",
-                        help="If supplied then when uploading to AN will include the background tag. Theoretically should be faster however testing hasn't been clear."
+                        help="If supplied then when uploading to AN will include the background tag. Uploads are rate limited the same with or without it."
+                        )
+    parser.add_argument(CommmandFlags.AN_WORKERS,
+                        dest="an_workers",
+                        default=ActionNetworkAPI.Constants.DEFAULT_UPLOAD_WORKERS,
+                        type=positiveInt,
+                        help="Number of concurrent uploads to AN. Uploads are still rate limited to stay under the AN rate limit."
                         )
     args = parser.parse_args()
     return CommmandFlags(args.filename,
@@ -177,7 +191,8 @@ def parseArgs():
                          automateActionNetwork = args.automate or args.automate_an,
                          automateGoogleDrive = args.automate or args.automate_gdrive,
                          useLocalRetention=args.use_local_retention,
-                         useANBackground=args.background)
+                         useANBackground=args.background,
+                         anWorkers=args.an_workers)
 
 def setup():
     if not os.path.exists(Constants.WORKING_DIR):
@@ -301,14 +316,13 @@ def processRetentionData(cols: list[str], rows: list[str], flags: CommmandFlags,
         logging.error("Neither local retention nor automated google drive was specified. Not saving retention.")
 
 # Returns the list of failed uploads
-def uploadToActionNetwork(cols: list[str], rows:list[str], useBackgroundProcessing:bool) -> list[tuple[str,str]]:
+def uploadToActionNetwork(cols: list[str], rows:list[str], useBackgroundProcessing:bool, maxWorkers:int) -> list[tuple[str,str]]:
     # For uploads we will not convert to our old columns but instead use what national sends down
     # For non-automated will keep the conversion, but our columns include spaces and capital letters
     # The API connector will auto-lowercase
     # We shouldn't lose any columns but we may have duplicates
     logging.info("Uploading members to action network")
     # A bit redundant to build this map but it will make building the person more convient later
-    # Also redundant to look up the col in the colToIndex map later when building people, but our col list length is small enough the simplicity and convience is worthwhile
     colToIndex = {}
     for index,val in enumerate(cols):
         colToIndex[val] = index
@@ -326,28 +340,35 @@ def uploadToActionNetwork(cols: list[str], rows:list[str], useBackgroundProcessi
                         Utils.Constants.MEMBERSHIP_LIST_COLS.ZIP_COL2,
                         Utils.Constants.MEMBERSHIP_LIST_COLS.FIRST_NAME,
                         Utils.Constants.MEMBERSHIP_LIST_COLS.LAST_NAME])
+    # Resolve column indexes once rather than per row, the address columns can have either name
+    firstNameIndex = colToIndex[Utils.Constants.MEMBERSHIP_LIST_COLS.FIRST_NAME]
+    lastNameIndex = colToIndex[Utils.Constants.MEMBERSHIP_LIST_COLS.LAST_NAME]
+    emailIndex = colToIndex[Utils.Constants.MEMBERSHIP_LIST_COLS.EMAIL_COL]
+    phoneIndex = colToIndex[Utils.Constants.MEMBERSHIP_LIST_COLS.PHONE]
+    stateIndex = Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.MAILING_STATE, Utils.Constants.MEMBERSHIP_LIST_COLS.STATE])
+    zipIndex = Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.ZIP_COL, Utils.Constants.MEMBERSHIP_LIST_COLS.ZIP_COL2])
+    cityIndex = Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.MAILING_CITY, Utils.Constants.MEMBERSHIP_LIST_COLS.CITY])
+    address1Index = Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.MAILING_ADDRESS_1, Utils.Constants.MEMBERSHIP_LIST_COLS.ADDRESS_1])
+    address2Index = Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.MAILING_ADDRESS_2, Utils.Constants.MEMBERSHIP_LIST_COLS.ADDRESS_2])
+    customFieldIndexes = [(col, colToIndex[col]) for col in cols if col not in nonCustomFields]
+
     peopleToPost = []
     for row in rows:
-        customFields = {}
-        for col in cols:
-            if col in nonCustomFields:
-                continue
-            customFields[col] = row[colToIndex[col]]
-
-        peopleToPost.append(ActionNetworkAPI.Person(firstName=row[colToIndex[Utils.Constants.MEMBERSHIP_LIST_COLS.FIRST_NAME]],
-                                                    lastName=row[colToIndex[Utils.Constants.MEMBERSHIP_LIST_COLS.LAST_NAME]],
-                                                    email=row[colToIndex[Utils.Constants.MEMBERSHIP_LIST_COLS.EMAIL_COL]],
-                                                    phone=row[colToIndex[Utils.Constants.MEMBERSHIP_LIST_COLS.PHONE]],
+        customFields = {col : row[index] for col, index in customFieldIndexes}
+
+        peopleToPost.append(ActionNetworkAPI.Person(firstName=row[firstNameIndex],
+                                                    lastName=row[lastNameIndex],
+                                                    email=row[emailIndex],
+                                                    phone=row[phoneIndex],
                                                     customFields=customFields,
                                                     address=ActionNetworkAPI.PersonAddress(
-                                                        region=row[Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.MAILING_STATE, Utils.Constants.MEMBERSHIP_LIST_COLS.STATE])],
-                                                        zip_code=row[Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.ZIP_COL, Utils.Constants.MEMBERSHIP_LIST_COLS.ZIP_COL2])],
-                                                        city=row[Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.MAILING_CITY, Utils.Constants.MEMBERSHIP_LIST_COLS.CITY])],
-                                                        address_lines=[row[Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.MAILING_ADDRESS_1, Utils.Constants.MEMBERSHIP_LIST_COLS.ADDRESS_1])],
-                                                                    row[Utils.getValueWithAnyName(colToIndex, [Utils.Constants.MEMBERSHIP_LIST_COLS.MAILING_ADDRESS_2, Utils.Constants.MEMBERSHIP_LIST_COLS.ADDRESS_2])]]
+                                                        region=row[stateIndex],
+                                                        zip_code=row[zipIndex],
+                                                        city=row[cityIndex],
+                                                        address_lines=[row[address1Index], row[address2Index]]
                                                     )))
-    api = ActionNetworkAPI.ActionNetworkAPI(apiKey=ActionNetworkAPI.ActionNetworkAPI.readAPIKeyFromFile(os.path.join(os.path.dirname(__file__),"actionNetworkAPIKey.txt")))
-    return api.postPeople(people=peopleToPost, useBackgroundProcessing=useBackgroundProcessing)
+    with ActionNetworkAPI.ActionNetworkAPI(apiKey=ActionNetworkAPI.ActionNetworkAPI.readAPIKeyFromFile(os.path.join(os.path.dirname(__file__),"actionNetworkAPIKey.txt"))) as api:
+        return api.postPeople(people=peopleToPost, useBackgroundProcessing=useBackgroundProcessing, maxWorkers=maxWorkers)
 
 def main():
     setup()
@@ -388,7 +409,7 @@ def main():
                 logging.info("Creating action network upload file")
                 Utils.writeCSVFile(os.path.join(Constants.OUTPUT_DIR_PATH, "action-network-"+Utils.Constants.TODAY_STR+".csv"), cols, rows)
             else:
-                failedUploads = uploadToActionNetwork(cols,rows,flags.useANBackground)
+                failedUploads = uploadToActionNetwork(cols,rows,flags.useANBackground,flags.anWorkers)
                 if len(failedUploads) > 0:
                     success = False
                 for (personText, errorText) in failedUploads:
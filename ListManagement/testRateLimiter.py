@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+import ActionNetworkAPI
+
+# Run from this directory with: python3 -m unittest testRateLimiter
+# These check timing so they allow some slack, but not enough to hide a request going out early
+
+class Constants:
+    RATE = 1/ActionNetworkAPI.Constants.SECONDS_PER_REQUEST
+    NUM_THREADS = 4
+    ACQUIRES_PER_THREAD = 3
+    TOLERANCE_SECONDS = 0.05
+
+class TestRateLimiter(unittest.TestCase):
+
+    # Has each thread acquire and returns the sorted times tokens were handed out
+    @staticmethod
+    def _acquireFromThreads(limiter: ActionNetworkAPI.RateLimiter, numThreads: int, acquiresPerThread: int) -> list[float]:
+        times = []
+        timesLock = threading.Lock()
+        def worker():
+            for _ in range(acquiresPerThread):
+                limiter.acquire()
+                with timesLock:
+                    times.append(time.monotonic())
+        threads = [threading.Thread(target=worker) for _ in range(numThreads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return sorted(times)
+
+    def testAcquiresAcrossThreadsAreSpacedByRate(self):
+        limiter = ActionNetworkAPI.RateLimiter(rate=Constants.RATE, burst=1)
+        start = time.monotonic()
+        times = TestRateLimiter._acquireFromThreads(limiter, Constants.NUM_THREADS, Constants.ACQUIRES_PER_THREAD)
+        numAcquires = Constants.NUM_THREADS * Constants.ACQUIRES_PER_THREAD
+
+        self.assertEqual(len(times), numAcquires)
+        expectedSeconds = (numAcquires - 1) / Constants.RATE
+        self.assertGreaterEqual(times[-1] - start, expectedSeconds - Constants.TOLERANCE_SECONDS)
+        self.assertLess(times[-1] - start, expectedSeconds + Constants.TOLERANCE_SECONDS * numAcquires)
+        for earlier, later in zip(times, times[1:]):
+            self.assertGreaterEqual(later - earlier, 1/Constants.RATE - Constants.TOLERANCE_SECONDS)
+
+    def testPauseHoldsEveryThread(self):
+        limiter = ActionNetworkAPI.RateLimiter(rate=Constants.RATE, burst=1)
+        limiter.acquire()
+        pauseSeconds = 0.5
+        pausedAt = time.monotonic()
+        limiter.pause(pauseSeconds)
+        times = TestRateLimiter._acquireFromThreads(limiter, Constants.NUM_THREADS, 1)
+
+        self.assertGreaterEqual(times[0] - pausedAt, pauseSeconds - Constants.TOLERANCE_SECONDS)
+        for earlier, later in zip(times, times[1:]):
+            self.assertGreaterEqual(later - earlier, 1/Constants.RATE - Constants.TOLERANCE_SECONDS)
+
+    def testCloseWakesWaiters(self):
+        limiter = ActionNetworkAPI.RateLimiter(rate=Constants.RATE, burst=1)
+        limiter.acquire()
+        limiter.pause(10)
+        errors = []
+        def worker():
+            try:
+                limiter.acquire()
+            except ActionNetworkAPI.RateLimiterClosed as err:
+                errors.append(err)
+        thread = threading.Thread(target=worker)
+        thread.start()
+        time.sleep(0.1)
+        limiter.close()
+        thread.join(timeout=1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -122,14 +122,14 @@ def main(args):
     numAbstain = 0
     outputCols = ["Name", "Email", "Vote", "Status"]
     outputRows = []
-    # It is inefficient to loop through the membership list each time for each vote
-    # However it is simple and easy, and our list is about 3k members and our votes are around 100 so at this point in time simplicity wins
+    # Normalize each membership email once and index the rows by it so each vote is a single lookup
+    # Emails can repeat in the membership list so keep every row for an email
+    emailIndex = membershipListColIndexes[Utils.Constants.MEMBERSHIP_LIST_COLS.EMAIL_COL]
+    membershipRowsByEmail = {}
+    for row in membershipListRows:
+        membershipRowsByEmail.setdefault(row[emailIndex].lower().strip(), []).append(row)
     for vote in votes:
-        for row in membershipListRows:
-            if row[membershipListColIndexes[Utils.Constants.MEMBERSHIP_LIST_COLS.EMAIL_COL]].lower().strip() != vote.email:
-                continue
-
-            
+        for row in membershipRowsByEmail.get(vote.email, []):
             vote.found = True
             vote.status = row[membershipListColIndexes[Utils.Constants.MEMBERSHIP_LIST_COLS.STANDING_COL]].lower().strip()
             print(f"Found member for email {vote.email} - {vote.vote} - {vote.status}")